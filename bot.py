@@ -1,573 +1,743 @@
-# bot.py
-
-import asyncio
-import logging
-
-from aiogram import Bot, Dispatcher, F, Router
-from aiogram.enums import ParseMode
-from aiogram.client.default import DefaultBotProperties
-from aiogram.filters import CommandStart, Command
-from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, CallbackQuery
-
-from config import BOT_TOKEN, ADMINS
-from states import Registration
-from keyboards import (
-    get_know_target_keyboard,
-    get_reset_confirm_keyboard,
-    get_hard_reset_confirm_keyboard,
-)
-from texts import PLAYER_MESSAGES, ADMIN_MESSAGES, BROADCAST_MESSAGES
-import db
-
-
-logging.basicConfig(level=logging.INFO)
-
-if not BOT_TOKEN:
-    raise RuntimeError("BOT_TOKEN is not set. Please configure it via config.py or environment variable.")
-
-bot = Bot(
-    BOT_TOKEN,
-    default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-)
-dp = Dispatcher()
-router = Router()
-dp.include_router(router)
-
-
-# --- ХЕЛПЕР ---
-
-
-def is_admin(user_id: int) -> bool:
-    return user_id in ADMINS
-
-
-# --- ХЕНДЛЕРЫ ДЛЯ ИГРОКОВ ---
-
-
-@router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext):
-    """
-    Старт игры / продолжение регистрации / поведение до и после жеребьёвки.
-    """
-    user = message.from_user
-    game_state = db.get_game_state()
-    player = db.get_or_create_player(user.id, user.username)
-
-    # --- Регистрация уже ЗАКРЫТА ---
-    if not game_state["registration_open"]:
-        # Игрок успел зарегистрироваться (есть имя и пожелания)
-        if player.get("full_name") and player.get("wish"):
-            # После жеребьёвки — можно ещё раз "Узнать"
-            await message.answer(
-                PLAYER_MESSAGES["already_registered_after_draw"],
-                reply_markup=get_know_target_keyboard()
-            )
-        else:
-            # Новый человек после закрытия регистрации
-            await message.answer(PLAYER_MESSAGES["start_after_close_new"])
-        return
-
-    # --- Регистрация ОТКРЫТА ---
-    await state.clear()
-
-    if not player.get("full_name"):
-        # Нет имени — начало регистрации
-        await message.answer(PLAYER_MESSAGES["start_new"])
-        await state.set_state(Registration.waiting_full_name)
-    elif not player.get("wish"):
-        # Есть имя, но нет пожеланий — продолжаем регистрацию
-        await message.answer(PLAYER_MESSAGES["ask_wish"])
-        await state.set_state(Registration.waiting_wish)
-    else:
-        # Уже всё заполнено, жеребьёвка ещё не проводилась — просто ждём
-        await message.answer(PLAYER_MESSAGES["already_registered_waiting_draw"])
-
-
-@router.message(Registration.waiting_full_name)
-async def process_full_name(message: Message, state: FSMContext):
-    """
-    Обработка имени и фамилии.
-    Разрешаем только обычный текст, без команд.
-    """
-    # Если нет текста (стикер, фото, голос и т.п.)
-    if not message.text:
-        await message.answer(
-            "Пожалуйста, напиши *имя и фамилию* обычным текстом, без стикеров и картинок 🙂"
-        )
-        return
-
-    text = message.text.strip()
-
-    # Если человек пытается ввести команду вместо имени
-    if text.startswith("/"):
-        await message.answer(
-            "Сейчас мне нужно только твоё *имя и фамилия*.\n"
-            "Пожалуйста, напиши их обычным текстом, без команд 🙂"
-        )
-        return
-
-    # Нормальный текст — сохраняем как имя
-    full_name = text
-    db.update_full_name(message.from_user.id, full_name)
-
-    await message.answer(PLAYER_MESSAGES["ask_wish"])
-    await state.set_state(Registration.waiting_wish)
-
-@router.message(Registration.waiting_wish)
-async def process_wish(message: Message, state: FSMContext):
-    """
-    Обработка пожеланий.
-    Разрешаем только обычный текст, без команд.
-    """
-    if not message.text:
-        await message.answer(
-            "Пожалуйста, напиши, *что хочешь получить, а что точно нет* — обычным текстом 🙂"
-        )
-        return
-
-    text = message.text.strip()
-
-    if text.startswith("/"):
-        await message.answer(
-            "Сейчас мне нужно только твоё пожелание к подарку 🎁\n"
-            "Напиши, что хочешь получить, а что не хочешь — обычным текстом, без команд 🙂"
-        )
-        return
-
-    wish = text
-    db.update_wish(message.from_user.id, wish)
-    await state.clear()
-
-    await message.answer(PLAYER_MESSAGES["registration_done_info"])
-
-@router.callback_query(F.data == "know_target")
-async def on_know_target(callback: CallbackQuery):
-    """
-    Кнопка «Узнать» — узнать, кому даришь подарок.
-    Поведение зависит от стадии игры и наличия target_id.
-    """
-    user = callback.from_user
-    player = db.get_player_by_tg(user.id)
-
-    if not player or not player.get("full_name") or not player.get("wish"):
-        await callback.message.answer(PLAYER_MESSAGES["know_not_finished_registration"])
-        await callback.answer()
-        return
-
-    game_state = db.get_game_state()
-
-    # Ещё не провели жеребьёвку
-    if game_state["registration_open"]:
-        await callback.message.answer(PLAYER_MESSAGES["know_before_draw"])
-        await callback.answer()
-        return
-
-    # Жеребьёвка завершена, ищем target
-    target_id = player.get("target_id")
-    if not target_id:
-        await callback.message.answer(PLAYER_MESSAGES["know_no_target_error"])
-        await callback.answer()
-        return
-
-    receiver = db.get_player_by_id(target_id)
-    if not receiver:
-        await callback.message.answer(PLAYER_MESSAGES["know_no_target_error"])
-        await callback.answer()
-        return
-
-    text = PLAYER_MESSAGES["know_after_draw"].format(
-        target_full_name=receiver.get("full_name", "Участник"),
-        target_wish=receiver.get("wish", "Без пожеланий")
-    )
-    await callback.message.answer(text)
-    await callback.answer()
-
-
-# --- ХЕНДЛЕРЫ ДЛЯ АДМИНА ---
-
-
-@router.message(Command("players"))
-async def cmd_players(message: Message):
-    """
-    Список всех игроков и их статусов (для админа).
-    Без Markdown, чтобы ничего не падало из-за форматирования.
-    """
-    if not is_admin(message.from_user.id):
-        return
-
-    players = db.get_all_players()
-    if not players:
-        await message.answer("Игроков пока нет.")
-        return
-
-    lines = []
-    lines.append("Список игроков:\n")
-
-    for p in players:
-        statuses = []
-
-        if p.get("full_name"):
-            statuses.append("имя ок")
-        else:
-            statuses.append("нет имени")
-
-        if p.get("wish"):
-            statuses.append("пожелания ок")
-        else:
-            statuses.append("нет пожеланий")
-
-        if p.get("target_id"):
-            # Пара назначена, но не показываем кому
-            statuses.append("пара назначена")
-        else:
-            statuses.append("пара не назначена")
-
-        block = (
-            f"id={p['id']} | tg_id={p['tg_id']} | "
-            f"@{p['tg_username'] if p.get('tg_username') else '-'}\n"
-            f"Имя: {p.get('full_name') or '— не указано'}\n"
-            f"Статус: " + " / ".join(statuses) + "\n"
-        )
-        lines.append(block)
-
-    text = "\n".join(lines)
-
-    # Отправляем БЕЗ parse_mode, чтобы Telegram не пытался парсить Markdown
-    await message.answer(text, parse_mode=None)
-
-
-@router.message(Command("help_admin"))
-async def cmd_help_admin(message: Message):
-    if not is_admin(message.from_user.id):
-        return
-
-    text = (
-        "Команды администратора:\n\n"
-        "/players — список игроков и их статусы\n"
-        "/status — состояние игры\n"
-        "/close_reg — боевая жеребьёвка\n"
-        "/test_draw — тестовая жеребьёвка\n"
-        "/pairs — показать, кто кому дарит (кроме самого админа)\n"
-        "/reset_game — мягкий сброс\n"
-        "/reset_all — полный сброс\n"
-        "/help_admin — показать список команд\n"
-    )
-
-    await message.answer(text, parse_mode=None)
-
-@router.message()
-async def fallback_message(message: Message):
-    """
-    Ответ на любые сообщения/команды, которые не попали ни в один хендлер.
-    """
-    # Если это админ — подсказываем про /help_admin
-    if is_admin(message.from_user.id):
-        await message.answer(
-            "Я не понимаю эту команду.\n"
-            "Используй /help_admin, чтобы посмотреть доступные команды администратора.",
-            parse_mode=None
-        )
-        return
-
-    # Обычный игрок
-    await message.answer(
-        "Я пока понимаю только команды, связанные с игрой Тайный Санта 🎅\n\n"
-        "Нажми /start, чтобы начать или продолжить участие в игре.",
-        parse_mode=None
-    )
-
-@router.message(Command("pairs"))
-async def cmd_pairs(message: Message):
-    """
-    Показать всем парам Тайных Сант (для админа),
-    но не раскрывать, кому дарит сам админ.
-    """
-    if not is_admin(message.from_user.id):
-        return
-
-    admin_tg_id = message.from_user.id
-
-    # Берём только игроков, которые "готовы" (есть имя и пожелания)
-    players_ready = db.get_all_players_ready()
-    if not players_ready:
-        await message.answer("Пока нет игроков с заполненными данными.", parse_mode=None)
-        return
-
-    lines = ["Список пар Тайных Сант:\n"]
-    admin_has_pair = False
-
-    for santa in players_ready:
-        target_id = santa.get("target_id")
-        if not target_id:
-            # Для этого игрока пара ещё не назначена
-            continue
-
-        # Если это сам админ как игрок — не показываем, кому он дарит
-        if santa["tg_id"] == admin_tg_id:
-            admin_has_pair = True
-            continue
-
-        receiver = db.get_player_by_id(target_id)
-        if not receiver:
-            continue
-
-        santa_name = santa.get("full_name") or "Без имени"
-        santa_username = santa.get("tg_username") or "-"
-
-        receiver_name = receiver.get("full_name") or "Без имени"
-        receiver_wish = receiver.get("wish") or "Без пожеланий"
-
-        line = (
-            f"{santa_name} (@{santa_username}) → {receiver_name}\n"
-            f"Пожелания получателя: {receiver_wish}\n"
-        )
-        lines.append(line)
-
-    if len(lines) == 1:
-        # Никому ещё не назначили пары или данные не заполнены
-        await message.answer("Пары ещё не распределены или нет готовых игроков.", parse_mode=None)
-        return
-
-    # Если админ тоже участвует как игрок — мягко скажем, что его пары тут нет
-    if admin_has_pair:
-        lines.append(
-            "\nТы тоже участвуешь как игрок 🎅\n"
-            "Твоя собственная пара скрыта, чтобы сохранить сюрприз 🙂"
-        )
-
-    await message.answer("\n".join(lines), parse_mode=None)
-
-@router.message(Command("status"))
-async def cmd_status(message: Message):
-    """
-    Статус игры: регистрация, количество игроков, распределены ли пары.
-    """
-    if not is_admin(message.from_user.id):
-        return
-
-    state = db.get_game_state()
-    all_players = db.get_all_players()
-    ready_players = db.get_all_players_ready()
-
-    reg_status = "открыта" if state["registration_open"] else "закрыта"
-    pairs_status = "да" if state["pairs_assigned"] else "нет"
-
-    text = ADMIN_MESSAGES["status_template"].format(
-        reg_status=reg_status,
-        total=len(all_players),
-        with_wish=len(ready_players),
-        pairs_status=pairs_status,
-    )
-    await message.answer(text)
-
-
-@router.message(Command("close_reg"))
-async def cmd_close_reg(message: Message):
-    """
-    Основная (боевая) жеребьёвка + закрытие регистрации.
-    """
-    if not is_admin(message.from_user.id):
-        return
-
-    game_state = db.get_game_state()
-    # если уже закрыли и пары распределены
-    if (not game_state["registration_open"]) and game_state["pairs_assigned"]:
-        await message.answer(ADMIN_MESSAGES["close_reg_already_closed"])
-        return
-
-    # пытаемся распределить пары
-    success, count = db.assign_pairs()
-    if not success:
-        if count < 2:
-            text = ADMIN_MESSAGES["close_reg_not_enough_players"].format(count=count)
-            await message.answer(text)
-        else:
-            await message.answer("Не удалось корректно распределить пары. Попробуй ещё раз.")
-        return
-
-    # успех
-    await message.answer(
-        ADMIN_MESSAGES["close_reg_success"].format(players_count=count)
-    )
-
-    # рассылаем уведомление всем участникам с пожеланиями:
-    # 1) "жеребьёвка завершена"
-    # 2) "Пришло время узнать." + кнопка "Узнать"
-    players_ready = db.get_all_players_ready()
-    for p in players_ready:
-        try:
-            await bot.send_message(
-                p["tg_id"],
-                BROADCAST_MESSAGES["after_draw_notification"]
-            )
-            await bot.send_message(
-                p["tg_id"],
-                PLAYER_MESSAGES["registration_done_ask_know"],
-                reply_markup=get_know_target_keyboard()
-            )
-        except Exception as e:
-            logging.warning(f"Не удалось отправить сообщение игроку {p['tg_id']}: {e}")
-
-
-@router.message(Command("test_draw"))
-async def cmd_test_draw(message: Message):
-    """
-    Тестовая жеребьёвка:
-    - ведёт себя как настоящая (записывает target_id, закрывает регистрацию),
-    - шлёт уведомления игрокам,
-    - после теста можно сделать /reset_game или /reset_all.
-    """
-    if not is_admin(message.from_user.id):
-        return
-
-    game_state = db.get_game_state()
-    # если уже проводили боевую жеребьёвку
-    if (not game_state["registration_open"]) and game_state["pairs_assigned"]:
-        await message.answer(
-            "Пары уже распределены.\n\n"
-            "Чтобы запустить тестовую жеребьёвку ещё раз, сначала сделай /reset_game или /reset_all."
-        )
-        return
-
-    success, count = db.assign_pairs()
-    if not success:
-        if count < 2:
-            text = ADMIN_MESSAGES["close_reg_not_enough_players"].format(count=count)
-            await message.answer("Тестовая жеребьёвка невозможна.\n\n" + text)
-        else:
-            await message.answer("Не удалось корректно распределить тестовые пары. Попробуй ещё раз.")
-        return
-
-    # уведомление админу
-    await message.answer(
-        "🧪 *Тестовая жеребьёвка завершена!*\n\n"
-        f"Игроков в тесте: *{count}*.\n"
-        "Пары сохранены в БД, игроки получили уведомления и могут нажимать «Узнать».\n\n"
-        "Когда закончишь тест, выполни команду /reset_game или /reset_all, чтобы всё сбросить."
-    )
-
-    # шлём игрокам уведомление + кнопку «Узнать» (как в боевой жеребьёвке)
-    players_ready = db.get_all_players_ready()
-    for p in players_ready:
-        try:
-            await bot.send_message(
-                p["tg_id"],
-                BROADCAST_MESSAGES["after_draw_notification"]
-            )
-            await bot.send_message(
-                p["tg_id"],
-                PLAYER_MESSAGES["registration_done_ask_know"],
-                reply_markup=get_know_target_keyboard()
-            )
-        except Exception as e:
-            logging.warning(
-                f"[TEST DRAW] Не удалось отправить сообщение игроку {p['tg_id']}: {e}"
-            )
-
-
-@router.message(Command("reset_game"))
-async def cmd_reset_game(message: Message):
-    """
-    Мягкий сброс игры:
-    - очищаем имена, пожелания и пары,
-    - но сохраняем самих игроков (tg_id и username),
-    - заново открываем регистрацию.
-    Требует подтверждения через inline-кнопку.
-    """
-    if not is_admin(message.from_user.id):
-        return
-
-    warning = (
-        "⚠ *МЯГКИЙ СБРОС ИГРЫ*\n\n"
-        "Будут удалены *имена, пожелания и все пары*, но список игроков сохранится.\n"
-        "Игроки смогут зарегистрироваться заново.\n\n"
-        "Подтверди действие кнопкой ниже:"
-    )
-
-    await message.answer(
-        warning,
-        reply_markup=get_reset_confirm_keyboard()
-    )
-
-
-@router.callback_query(F.data == "admin_reset_game_confirm")
-async def admin_reset_confirm(callback: CallbackQuery):
-    """
-    Подтверждение мягкого сброса игры.
-    """
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Недостаточно прав", show_alert=True)
-        return
-
-    db.reset_game()
-
-    await callback.message.answer(
-        "♻ Мягкий сброс выполнен!\n\n"
-        "Имена, пожелания и пары очищены.\n"
-        "Регистрация снова открыта. 🎅"
-    )
-    await callback.answer()
-
-
-@router.message(Command("reset_all"))
-async def cmd_reset_all(message: Message):
-    """
-    Полный сброс игры:
-    - удаляем всех игроков,
-    - сбрасываем состояние игры,
-    - начинаем абсолютно новую игру.
-    Требует подтверждения через отдельную inline-кнопку.
-    """
-    if not is_admin(message.from_user.id):
-        return
-
-    warning = (
-        "🗑 *ПОЛНЫЙ СБРОС ИГРЫ*\n\n"
-        "Ты собираешься *полностью* удалить всех зарегистрированных игроков "
-        "и начать игру с нуля.\n\n"
-        "Будут удалены *все игроки, их пожелания и пары*.\n"
-        "ЭТО ДЕЙСТВИЕ НЕОБРАТИМО.\n\n"
-        "Если ты уверен, нажми кнопку ниже:"
-    )
-
-    await message.answer(
-        warning,
-        reply_markup=get_hard_reset_confirm_keyboard()
-    )
-
-
-@router.callback_query(F.data == "admin_hard_reset_game_confirm")
-async def admin_hard_reset_confirm(callback: CallbackQuery):
-    """
-    Подтверждение полного сброса игры.
-    """
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Недостаточно прав", show_alert=True)
-        return
-
-    db.hard_reset_game()
-
-    await callback.message.answer(
-        "🗑 *Полный сброс выполнен!*\n\n"
-        "Все игроки удалены, регистрация открыта.\n"
-        "Можно начинать абсолютно новую игру 🎅"
-    )
-    await callback.answer()
-
-
-# --- MAIN ---
-
-
-async def main():
-    db.init_db()
-    await dp.start_polling(bot)
-
-
-if __name__ == "__main__":
-    asyncio.run(main())
-
-
-
-
-
+# bot.py
+
+import asyncio
+import collections
+import concurrent.futures
+import logging
+
+from aiogram import BaseMiddleware, Bot, Dispatcher, F, Router
+from aiogram.client.default import DefaultBotProperties
+from aiogram.filters import CommandStart, Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, CallbackQuery
+from aiolimiter import AsyncLimiter
+
+from config import BOT_TOKEN, ADMINS, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_PORT
+from states import Registration
+from keyboards import (
+    get_know_target_keyboard,
+    get_reset_confirm_keyboard,
+    get_hard_reset_confirm_keyboard,
+)
+from texts import PLAYER_MESSAGES, ADMIN_MESSAGES, BROADCAST_MESSAGES
+import db
+
+
+log = logging.getLogger("santa.bot")
+
+# frozenset даёт O(1) проверку прав на каждом входящем сообщении
+_ADMIN_IDS = frozenset(ADMINS)
+
+if not BOT_TOKEN:
+    raise RuntimeError("BOT_TOKEN is not set. Please configure it via config.py or environment variable.")
+
+# Все постоянные параметры отправки задаём один раз здесь,
+# чтобы не передавать их в каждом send_message.
+# parse_mode=None: шлём обычный текст — Telegram ничего не парсит,
+# и звёздочки/подчёркивания в пожеланиях игроков не ломают отправку.
+bot = Bot(
+    BOT_TOKEN,
+    default=DefaultBotProperties(
+        parse_mode=None,
+        link_preview_is_disabled=True,
+        protect_content=False,
+    )
+)
+dp = Dispatcher()
+
+# Админские команды живут на отдельном роутере с фильтром по id,
+# чтобы чужие апдейты вообще не доходили до хендлеров.
+admin_router = Router()
+admin_router.message.filter(F.from_user.id.in_(_ADMIN_IDS))
+admin_router.callback_query.filter(F.from_user.id.in_(_ADMIN_IDS))
+
+router = Router()
+
+dp.include_router(admin_router)
+dp.include_router(router)
+
+# Telegram разрешает ~30 сообщений в секунду на бота.
+# Берём 25, чтобы оставить запас и не ловить 429.
+TG_LIMITER = AsyncLimiter(25, 1.0)
+
+# Клавиатуры неизменяемые — собираем один раз при импорте, а не на каждый ответ
+KB_KNOW_TARGET = get_know_target_keyboard()
+KB_RESET_CONFIRM = get_reset_confirm_keyboard()
+KB_HARD_RESET_CONFIRM = get_hard_reset_confirm_keyboard()
+
+# Фильтры тоже неизменяемые — создаём по одному экземпляру на модуль
+CMD_PLAYERS = Command("players")
+CMD_HELP_ADMIN = Command("help_admin")
+CMD_PAIRS = Command("pairs")
+CMD_STATUS = Command("status")
+CMD_CLOSE_REG = Command("close_reg")
+CMD_TEST_DRAW = Command("test_draw")
+CMD_RESET_GAME = Command("reset_game")
+CMD_RESET_ALL = Command("reset_all")
+# Заранее привязанные .format горячих шаблонов: убирает lookup словаря
+# и метода на каждом вызове
+_FMT_STATUS = ADMIN_MESSAGES["status_template"].format
+_FMT_KNOW_AFTER_DRAW = PLAYER_MESSAGES["know_after_draw"].format
+_FMT_CLOSE_REG_SUCCESS = ADMIN_MESSAGES["close_reg_success"].format
+_FMT_NOT_ENOUGH_PLAYERS = ADMIN_MESSAGES["close_reg_not_enough_players"].format
+_FMT_TEST_DRAW_SUCCESS = ADMIN_MESSAGES["test_draw_success"].format
+
+F_KNOW_TARGET = F.data == "know_target"
+F_RESET_CONFIRM = F.data == "admin_reset_game_confirm"
+F_HARD_RESET_CONFIRM = F.data == "admin_hard_reset_game_confirm"
+
+
+# --- ХЕЛПЕРЫ ---
+
+
+_NO_NAME = "Без имени"
+_NO_WISH = "Без пожеланий"
+
+# статусные подписи для /players — константы вместо литералов в цикле
+_NAME_OK, _NAME_NO = "имя ок", "нет имени"
+_WISH_OK, _WISH_NO = "пожелания ок", "нет пожеланий"
+_PAIR_OK, _PAIR_NO = "пара назначена", "пара не назначена"
+
+
+def is_admin(user_id: int) -> bool:
+    return user_id in _ADMIN_IDS
+
+
+# Отдельный пул под запросы к БД: не делим потоки с asyncio.to_thread
+# и ограничиваем параллелизм sqlite разумным числом воркеров
+EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="db")
+
+
+async def _db(fn, *args):
+    """
+    Выполняет синхронную функцию db.* в пуле потоков,
+    чтобы sqlite-вызовы не блокировали event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(EXECUTOR, fn, *args)
+
+
+async def _cached_game_state():
+    """
+    Состояние игры кэшируется в самом db-модуле (писатели обновляют кэш
+    после коммита), так что после первого вызова это просто dict из памяти.
+    """
+    return await _db(db.get_game_state)
+
+
+# Кэш записей игроков по tg_id: повторные нажатия «Узнать» не ходят в БД.
+# OrderedDict работает как LRU с ограничением размера.
+_PLAYER_CACHE = collections.OrderedDict()
+_PLAYER_CACHE_MAX = 10_000
+
+
+async def _cached_player_by_tg(tg_id: int):
+    v = _PLAYER_CACHE.get(tg_id)
+    if v is not None:
+        _PLAYER_CACHE.move_to_end(tg_id)
+        return v
+    v = await _db(db.get_player_by_tg, tg_id)
+    if v:
+        _PLAYER_CACHE[tg_id] = v
+        if len(_PLAYER_CACHE) > _PLAYER_CACHE_MAX:
+            _PLAYER_CACHE.popitem(last=False)
+    return v
+
+
+class PlayerContextMiddleware(BaseMiddleware):
+    """
+    Прокидывает в хендлеры колбэков готовую запись игрока (через кэш),
+    чтобы хендлер не доставал её заново из БД.
+    На message-хендлеры не вешаем: /start делает upsert, а остальным
+    запись игрока не нужна — лишнее чтение на каждый апдейт ни к чему.
+    """
+    async def __call__(self, handler, event, data):
+        data["player"] = await _cached_player_by_tg(event.from_user.id)
+        return await handler(event, data)
+
+
+router.callback_query.middleware(PlayerContextMiddleware())
+
+
+# После жеребьёвки ответ /start для зарегистрированных игроков зависит только
+# от членства в этом множестве — самый горячий повторяющийся путь обходится
+# одной проверкой hash-set, вообще без БД. После рестарта множество пустое,
+# и /start просто идёт по обычному пути через БД.
+_POST_DRAW_READY: frozenset = frozenset()
+
+
+def _invalidate_player_cache(tg_id=None):
+    """
+    Сбрасывает кэш игрока (или весь кэш, если tg_id не задан —
+    например, после жеребьёвки или сброса игры).
+    """
+    if tg_id is None:
+        _PLAYER_CACHE.clear()
+    else:
+        _PLAYER_CACHE.pop(tg_id, None)
+
+
+def _fmt_player(p) -> str:
+    """
+    Одна карточка игрока для /players: пара назначена или нет — без раскрытия кому.
+    """
+    name = p["full_name"]
+    wish = p["wish"]
+    target_id = p["target_id"]
+    username = p["tg_username"] or "-"
+    return (
+        f"id={p['id']} | tg_id={p['tg_id']} | @{username}\n"
+        f"Имя: {name or '— не указано'}\n"
+        f"Статус: {_NAME_OK if name else _NAME_NO} / "
+        f"{_WISH_OK if wish else _WISH_NO} / "
+        f"{_PAIR_OK if target_id else _PAIR_NO}\n"
+    )
+
+
+# Раньше рассылка слала два сообщения подряд; одно сообщение с кнопкой
+# вдвое экономит вызовы API и бюджет лимита Telegram (~30 msg/s на бота)
+_AFTER_DRAW_TEXT = (
+    BROADCAST_MESSAGES["after_draw_notification"]
+    + "\n\n"
+    + PLAYER_MESSAGES["registration_done_ask_know"]
+)
+
+
+# Очередь исходящих уведомлений: команда админа только кладёт игроков сюда
+# и сразу отвечает, а выделенный воркер шлёт сообщения, сглаживая нагрузку
+# под лимит Telegram.
+_SEND_QUEUE: asyncio.Queue = asyncio.Queue()
+
+
+def _enqueue_broadcast(players_ready):
+    """
+    Ставит игроков в очередь рассылки "жеребьёвка завершена" + кнопка "Узнать".
+    """
+    for p in players_ready:
+        _SEND_QUEUE.put_nowait(p)
+
+
+async def _broadcast_worker():
+    """
+    Фоновый воркер рассылки: разбирает очередь и шлёт уведомления
+    через лимитер. Запускается один раз при старте бота.
+    """
+    while True:
+        p = await _SEND_QUEUE.get()
+        try:
+            async with TG_LIMITER:
+                await bot.send_message(
+                    p["tg_id"],
+                    _AFTER_DRAW_TEXT,
+                    reply_markup=KB_KNOW_TARGET
+                )
+            # mark_notified — тоже внутри try: если запись флага упадёт,
+            # воркер должен пережить это, а не умереть навсегда
+            await _db(db.mark_notified, p["id"])
+        except Exception as e:
+            # при ошибке отправки флаг notified не ставим — доставим после
+            # рестарта; %s-форматирование ленивое — строка собирается
+            # только при записи
+            log.warning("Не удалось отправить сообщение игроку %s: %s", p["tg_id"], e)
+        finally:
+            _SEND_QUEUE.task_done()
+
+
+async def replay_pending_broadcasts():
+    """
+    Дорассылка после рестарта: если бот упал посреди рассылки,
+    шлём уведомления тем, у кого пара назначена, а флага notified нет.
+    """
+    pending = await _db(db.get_unnotified_players)
+    if pending:
+        log.warning("Дорассылка после рестарта: игроков без уведомления — %s", len(pending))
+        _enqueue_broadcast(pending)
+
+
+# --- ХЕНДЛЕРЫ ДЛЯ ИГРОКОВ ---
+
+
+@router.message(CommandStart())
+async def cmd_start(message: Message, state: FSMContext):
+    """
+    Старт игры / продолжение регистрации / поведение до и после жеребьёвки.
+    """
+    user = message.from_user
+
+    # быстрый путь: игрок из прошедшей жеребьёвки — отвечаем без чтения БД
+    if user.id in _POST_DRAW_READY:
+        await message.answer(
+            PLAYER_MESSAGES["already_registered_after_draw"],
+            reply_markup=KB_KNOW_TARGET
+        )
+        return
+
+    # состояние игры и запись игрока не зависят друг от друга — читаем параллельно
+    game_state, player = await asyncio.gather(
+        _cached_game_state(),
+        _db(db.get_or_create_player, user.id, user.username),
+    )
+
+    # --- Регистрация уже ЗАКРЫТА ---
+    if not game_state["registration_open"]:
+        # Игрок успел зарегистрироваться (есть имя и пожелания)
+        if player["full_name"] and player["wish"]:
+            # После жеребьёвки — можно ещё раз "Узнать"
+            await message.answer(
+                PLAYER_MESSAGES["already_registered_after_draw"],
+                reply_markup=KB_KNOW_TARGET
+            )
+        else:
+            # Новый человек после закрытия регистрации
+            await message.answer(PLAYER_MESSAGES["start_after_close_new"])
+        return
+
+    # --- Регистрация ОТКРЫТА ---
+    await state.clear()
+
+    if not player["full_name"]:
+        # Нет имени — начало регистрации
+        await message.answer(PLAYER_MESSAGES["start_new"])
+        await state.set_state(Registration.waiting_full_name)
+    elif not player["wish"]:
+        # Есть имя, но нет пожеланий — продолжаем регистрацию
+        await message.answer(PLAYER_MESSAGES["ask_wish"])
+        await state.set_state(Registration.waiting_wish)
+    else:
+        # Уже всё заполнено, жеребьёвка ещё не проводилась — просто ждём
+        await message.answer(PLAYER_MESSAGES["already_registered_waiting_draw"])
+
+
+@router.message(Registration.waiting_full_name)
+async def process_full_name(message: Message, state: FSMContext):
+    """
+    Обработка имени и фамилии.
+    Разрешаем только обычный текст, без команд.
+    """
+    # Если нет текста (стикер, фото, голос и т.п.)
+    if not message.text:
+        await message.answer(
+            "Пожалуйста, напиши *имя и фамилию* обычным текстом, без стикеров и картинок 🙂"
+        )
+        return
+
+    text = message.text.strip()
+
+    # Если человек пытается ввести команду вместо имени
+    if text.startswith("/"):
+        await message.answer(
+            "Сейчас мне нужно только твоё *имя и фамилия*.\n"
+            "Пожалуйста, напиши их обычным текстом, без команд 🙂"
+        )
+        return
+
+    # Нормальный текст — сохраняем как имя
+    full_name = text
+    await _db(db.update_full_name, message.from_user.id, full_name)
+    _invalidate_player_cache(message.from_user.id)
+
+    await message.answer(PLAYER_MESSAGES["ask_wish"])
+    await state.set_state(Registration.waiting_wish)
+
+@router.message(Registration.waiting_wish)
+async def process_wish(message: Message, state: FSMContext):
+    """
+    Обработка пожеланий.
+    Разрешаем только обычный текст, без команд.
+    """
+    if not message.text:
+        await message.answer(
+            "Пожалуйста, напиши, *что хочешь получить, а что точно нет* — обычным текстом 🙂"
+        )
+        return
+
+    text = message.text.strip()
+
+    if text.startswith("/"):
+        await message.answer(
+            "Сейчас мне нужно только твоё пожелание к подарку 🎁\n"
+            "Напиши, что хочешь получить, а что не хочешь — обычным текстом, без команд 🙂"
+        )
+        return
+
+    wish = text
+    await _db(db.update_wish, message.from_user.id, wish)
+    _invalidate_player_cache(message.from_user.id)
+    await state.clear()
+
+    await message.answer(PLAYER_MESSAGES["registration_done_info"])
+
+@router.callback_query(F_KNOW_TARGET)
+async def on_know_target(callback: CallbackQuery, player):
+    """
+    Кнопка «Узнать» — узнать, кому даришь подарок.
+    Поведение зависит от стадии игры и наличия target_id.
+    Запись игрока приходит из PlayerContextMiddleware.
+    """
+    user = callback.from_user
+
+    if not player or not player["full_name"] or not player["wish"]:
+        await callback.message.answer(PLAYER_MESSAGES["know_not_finished_registration"])
+        await callback.answer()
+        return
+
+    game_state = await _cached_game_state()
+
+    # Ещё не провели жеребьёвку
+    if game_state["registration_open"]:
+        await callback.message.answer(PLAYER_MESSAGES["know_before_draw"])
+        await callback.answer()
+        return
+
+    # Жеребьёвка завершена, ищем target
+    target_id = player["target_id"]
+    if not target_id:
+        await callback.message.answer(PLAYER_MESSAGES["know_no_target_error"])
+        await callback.answer()
+        return
+
+    # имя и пожелания получателя денормализованы в строку Санты при жеребьёвке —
+    # второй запрос в БД не нужен
+    target_full_name = player["target_full_name"]
+    target_wish = player["target_wish"]
+
+    if not target_full_name:
+        # пара назначалась до миграции — Санта и получатель одним JOIN-запросом
+        _, receiver = await _db(db.get_player_and_target, user.id)
+        if not receiver:
+            await callback.message.answer(PLAYER_MESSAGES["know_no_target_error"])
+            await callback.answer()
+            return
+        target_full_name = receiver.get("full_name") or "Участник"
+        target_wish = receiver.get("wish")
+
+    text = _FMT_KNOW_AFTER_DRAW(
+        target_full_name=target_full_name,
+        target_wish=target_wish or _NO_WISH
+    )
+    await callback.message.answer(text)
+    await callback.answer()
+
+
+# --- ХЕНДЛЕРЫ ДЛЯ АДМИНА ---
+
+
+@admin_router.message(CMD_PLAYERS)
+async def cmd_players(message: Message):
+    """
+    Список всех игроков и их статусов (для админа).
+    Без Markdown, чтобы ничего не падало из-за форматирования.
+    """
+    players = await _db(db.get_all_players)
+    if not players:
+        await message.answer("Игроков пока нет.")
+        return
+
+    # Telegram ограничивает сообщение 4096 символами —
+    # шлём список частями по мере заполнения буфера, не собирая всё в памяти.
+    buf = ["Список игроков:\n"]
+    size = len(buf[0])
+    for p in players:
+        block = _fmt_player(p)
+        if size + len(block) > 4000:
+            async with TG_LIMITER:
+                await message.answer("\n".join(buf))
+            buf = []
+            size = 0
+        buf.append(block)
+        size += len(block) + 1
+    if buf:
+        async with TG_LIMITER:
+            await message.answer("\n".join(buf))
+
+
+@admin_router.message(CMD_HELP_ADMIN)
+async def cmd_help_admin(message: Message):
+    await message.answer(ADMIN_MESSAGES["help_admin"])
+
+@router.message()
+async def fallback_message(message: Message):
+    """
+    Ответ на любые сообщения/команды, которые не попали ни в один хендлер.
+    """
+    # Если это админ — подсказываем про /help_admin
+    if is_admin(message.from_user.id):
+        await message.answer(ADMIN_MESSAGES["fallback"])
+        return
+
+    # Обычный игрок
+    await message.answer(PLAYER_MESSAGES["fallback"])
+
+@admin_router.message(CMD_PAIRS)
+async def cmd_pairs(message: Message):
+    """
+    Показать всем парам Тайных Сант (для админа),
+    но не раскрывать, кому дарит сам админ.
+    """
+    admin_tg_id = message.from_user.id
+
+    # Берём только игроков, которые "готовы" (есть имя и пожелания)
+    players_ready = await _db(db.get_all_players_ready)
+    if not players_ready:
+        await message.answer("Пока нет игроков с заполненными данными.")
+        return
+
+    # Получателей тянем одним запросом, а не по одному на каждого Санту
+    target_ids = [s["target_id"] for s in players_ready if s["target_id"]]
+    receivers = await _db(db.get_players_by_ids, target_ids)
+
+    lines = ["Список пар Тайных Сант:\n"]
+    admin_has_pair = False
+
+    for santa in players_ready:
+        target_id = santa["target_id"]
+        if not target_id:
+            # Для этого игрока пара ещё не назначена
+            continue
+
+        # Если это сам админ как игрок — не показываем, кому он дарит
+        if santa["tg_id"] == admin_tg_id:
+            admin_has_pair = True
+            continue
+
+        receiver = receivers.get(target_id)
+        if not receiver:
+            continue
+
+        santa_name = santa["full_name"] or _NO_NAME
+        santa_username = santa["tg_username"] or "-"
+
+        receiver_name = receiver["full_name"] or _NO_NAME
+        receiver_wish = receiver["wish"] or _NO_WISH
+
+        lines.append(
+            f"{santa_name} (@{santa_username}) → {receiver_name}\n"
+            f"Пожелания получателя: {receiver_wish}\n"
+        )
+
+    if len(lines) == 1:
+        # Никому ещё не назначили пары или данные не заполнены
+        await message.answer("Пары ещё не распределены или нет готовых игроков.")
+        return
+
+    # Если админ тоже участвует как игрок — мягко скажем, что его пары тут нет
+    if admin_has_pair:
+        lines.append(
+            "\nТы тоже участвуешь как игрок 🎅\n"
+            "Твоя собственная пара скрыта, чтобы сохранить сюрприз 🙂"
+        )
+
+    await message.answer("\n".join(lines))
+
+@admin_router.message(CMD_STATUS)
+async def cmd_status(message: Message):
+    """
+    Статус игры: регистрация, количество игроков, распределены ли пары.
+    """
+    # три независимых чтения — выполняем параллельно
+    state, all_players, ready_players = await asyncio.gather(
+        _cached_game_state(),
+        _db(db.get_all_players),
+        _db(db.get_all_players_ready),
+    )
+
+    reg_status = "открыта" if state["registration_open"] else "закрыта"
+    pairs_status = "да" if state["pairs_assigned"] else "нет"
+
+    text = _FMT_STATUS(
+        reg_status=reg_status,
+        total=len(all_players),
+        with_wish=len(ready_players),
+        pairs_status=pairs_status,
+    )
+    await message.answer(text)
+
+
+async def _run_draw(message: Message, *, is_test: bool):
+    """
+    Общий сценарий жеребьёвки для /close_reg и /test_draw:
+    проверка состояния, распределение пар, ответ админу, фоновая рассылка.
+    """
+    game_state = await _cached_game_state()
+    # если уже закрыли и пары распределены
+    if (not game_state["registration_open"]) and game_state["pairs_assigned"]:
+        if is_test:
+            await message.answer(ADMIN_MESSAGES["test_draw_already_closed"])
+        else:
+            await message.answer(ADMIN_MESSAGES["close_reg_already_closed"])
+        return
+
+    # пытаемся распределить пары
+    success, count = await _db(db.assign_pairs)
+    # target_id изменился у всех — кэш игроков больше не актуален
+    _invalidate_player_cache()
+    if not success:
+        if count < 2:
+            text = _FMT_NOT_ENOUGH_PLAYERS(count=count)
+            if is_test:
+                text = "Тестовая жеребьёвка невозможна.\n\n" + text
+            await message.answer(text)
+        else:
+            await message.answer("Не удалось корректно распределить пары. Попробуй ещё раз.")
+        return
+
+    # успех — отвечаем админу
+    if is_test:
+        await message.answer(_FMT_TEST_DRAW_SUCCESS(count=count))
+    else:
+        await message.answer(_FMT_CLOSE_REG_SUCCESS(players_count=count))
+
+    # рассылка уходит в очередь — ответ админу не ждёт отправки сообщений
+    players_ready = await _db(db.get_all_players_ready)
+
+    global _POST_DRAW_READY
+    _POST_DRAW_READY = frozenset(p["tg_id"] for p in players_ready)
+
+    _enqueue_broadcast(players_ready)
+
+
+@admin_router.message(CMD_CLOSE_REG)
+async def cmd_close_reg(message: Message):
+    """
+    Основная (боевая) жеребьёвка + закрытие регистрации.
+    """
+    await _run_draw(message, is_test=False)
+
+
+@admin_router.message(CMD_TEST_DRAW)
+async def cmd_test_draw(message: Message):
+    """
+    Тестовая жеребьёвка:
+    - ведёт себя как настоящая (записывает target_id, закрывает регистрацию),
+    - шлёт уведомления игрокам,
+    - после теста можно сделать /reset_game или /reset_all.
+    """
+    await _run_draw(message, is_test=True)
+
+
+@admin_router.message(CMD_RESET_GAME)
+async def cmd_reset_game(message: Message):
+    """
+    Мягкий сброс игры:
+    - очищаем имена, пожелания и пары,
+    - но сохраняем самих игроков (tg_id и username),
+    - заново открываем регистрацию.
+    Требует подтверждения через inline-кнопку.
+    """
+    await message.answer(
+        ADMIN_MESSAGES["reset_soft_warning"],
+        reply_markup=KB_RESET_CONFIRM
+    )
+
+
+@admin_router.callback_query(F_RESET_CONFIRM)
+async def admin_reset_confirm(callback: CallbackQuery):
+    """
+    Подтверждение мягкого сброса игры.
+    """
+    await _db(db.reset_game)
+    _invalidate_player_cache()
+
+    global _POST_DRAW_READY
+    _POST_DRAW_READY = frozenset()
+
+    await callback.message.answer(ADMIN_MESSAGES["reset_soft_done"])
+    await callback.answer()
+
+
+@admin_router.message(CMD_RESET_ALL)
+async def cmd_reset_all(message: Message):
+    """
+    Полный сброс игры:
+    - удаляем всех игроков,
+    - сбрасываем состояние игры,
+    - начинаем абсолютно новую игру.
+    Требует подтверждения через отдельную inline-кнопку.
+    """
+    await message.answer(
+        ADMIN_MESSAGES["reset_hard_warning"],
+        reply_markup=KB_HARD_RESET_CONFIRM
+    )
+
+
+@admin_router.callback_query(F_HARD_RESET_CONFIRM)
+async def admin_hard_reset_confirm(callback: CallbackQuery):
+    """
+    Подтверждение полного сброса игры.
+    """
+    await _db(db.hard_reset_game)
+    _invalidate_player_cache()
+
+    global _POST_DRAW_READY
+    _POST_DRAW_READY = frozenset()
+
+    await callback.message.answer(ADMIN_MESSAGES["reset_hard_done"])
+    await callback.answer()
+
+
+# --- MAIN ---
+
+
+async def main():
+    db.init_db()
+    asyncio.create_task(_broadcast_worker())
+    asyncio.create_task(replay_pending_broadcasts())
+    # handle_as_tasks — каждый апдейт в своей задаче, медленный хендлер
+    # не блокирует остальные чаты; allowed_updates — Telegram не шлёт
+    # типы апдейтов, которые бот всё равно не обрабатывает
+    await dp.start_polling(
+        bot,
+        handle_as_tasks=True,
+        polling_timeout=30,
+        allowed_updates=["message", "callback_query"],
+    )
+
+
+def run_webhook():
+    """
+    Режим вебхука: Telegram пушит апдейты сам, без long polling.
+    Включается, когда в окружении задан WEBHOOK_URL.
+    """
+    from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+    from aiohttp import web
+
+    async def on_startup(app):
+        db.init_db()
+        asyncio.create_task(_broadcast_worker())
+        asyncio.create_task(replay_pending_broadcasts())
+        await bot.set_webhook(
+            f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            allowed_updates=["message", "callback_query"],
+        )
+
+    app = web.Application()
+    app.on_startup.append(on_startup)
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    web.run_app(app, host="0.0.0.0", port=WEBHOOK_PORT)
+
+
+if __name__ == "__main__":
+    # настраиваем логирование только при запуске как скрипт,
+    # чтобы импорт bot.py не трогал глобальное состояние logging
+    logging.basicConfig(level=logging.INFO)
+
+    # uvloop заметно ускоряет event loop, но ставится не везде (например, Windows)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
+    if WEBHOOK_URL:
+        run_webhook()
+    else:
+        asyncio.run(main())
+
+
+
+
+
@@ -1,6 +1,12 @@
-import os
-
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-ADMINS = [int(x) for x in os.getenv("ADMINS", "").split(",") if x]
-DB_PATH = "secret_santa.db"
-REVEAL_DATE = "19 декабря"
+import os
+
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+ADMINS = [int(x) for x in os.getenv("ADMINS", "").split(",") if x]
+DB_PATH = "secret_santa.db"
+REVEAL_DATE = "19 декабря"
+
+# Если WEBHOOK_URL задан (публичный https-адрес), бот работает через вебхук,
+# иначе — через long polling.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = "/webhook"
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
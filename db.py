@@ -1,356 +1,480 @@
-# db.py
-
-import sqlite3
-import random
-from datetime import datetime
-from typing import List, Dict, Tuple, Optional
-
-from config import DB_PATH
-
-
-def _dict_factory(cursor, row):
-    d = {}
-    for idx, col in enumerate(cursor.description):
-        d[col[0]] = row[idx]
-    return d
-
-
-def get_conn(dict_rows: bool = False) -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    if dict_rows:
-        conn.row_factory = _dict_factory
-    return conn
-
-
-# --- ИНИЦИАЛИЗАЦИЯ БД ---
-
-
-def init_db():
-    conn = get_conn()
-    c = conn.cursor()
-
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS players (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tg_id INTEGER UNIQUE NOT NULL,
-            tg_username TEXT,
-            full_name TEXT,
-            wish TEXT,
-            target_id INTEGER,
-            created_at TEXT,
-            updated_at TEXT
-        )
-        """
-    )
-
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS game_state (
-            id INTEGER PRIMARY KEY CHECK (id = 1),
-            registration_open INTEGER NOT NULL,
-            pairs_assigned INTEGER NOT NULL
-        )
-        """
-    )
-
-    # создаём одну строку состояния, если её нет
-    c.execute("SELECT COUNT(*) FROM game_state")
-    count = c.fetchone()[0]
-    if count == 0:
-        c.execute(
-            "INSERT INTO game_state (id, registration_open, pairs_assigned) VALUES (1, 1, 0)"
-        )
-
-    conn.commit()
-    conn.close()
-
-
-# --- ИГРОКИ ---
-
-
-def get_or_create_player(tg_id: int, tg_username: Optional[str]) -> Dict:
-    conn = get_conn(dict_rows=True)
-    c = conn.cursor()
-
-    c.execute("SELECT * FROM players WHERE tg_id = ?", (tg_id,))
-    row = c.fetchone()
-
-    if row:
-        conn.close()
-        return row
-
-    now = datetime.utcnow().isoformat()
-    c.execute(
-        """
-        INSERT INTO players (tg_id, tg_username, created_at, updated_at)
-        VALUES (?, ?, ?, ?)
-        """,
-        (tg_id, tg_username, now, now),
-    )
-    conn.commit()
-
-    c.execute("SELECT * FROM players WHERE tg_id = ?", (tg_id,))
-    row = c.fetchone()
-
-    conn.close()
-    return row
-
-
-def update_full_name(tg_id: int, full_name: str):
-    conn = get_conn()
-    c = conn.cursor()
-
-    now = datetime.utcnow().isoformat()
-    c.execute(
-        """
-        UPDATE players
-        SET full_name = ?, updated_at = ?
-        WHERE tg_id = ?
-        """,
-        (full_name, now, tg_id),
-    )
-    conn.commit()
-    conn.close()
-
-
-def update_wish(tg_id: int, wish: str):
-    conn = get_conn()
-    c = conn.cursor()
-
-    now = datetime.utcnow().isoformat()
-    c.execute(
-        """
-        UPDATE players
-        SET wish = ?, updated_at = ?
-        WHERE tg_id = ?
-        """,
-        (wish, now, tg_id),
-    )
-    conn.commit()
-    conn.close()
-
-
-def get_player_by_tg(tg_id: int) -> Optional[Dict]:
-    conn = get_conn(dict_rows=True)
-    c = conn.cursor()
-
-    c.execute("SELECT * FROM players WHERE tg_id = ?", (tg_id,))
-    row = c.fetchone()
-    conn.close()
-    return row
-
-
-def get_player_by_id(player_id: int) -> Optional[Dict]:
-    conn = get_conn(dict_rows=True)
-    c = conn.cursor()
-
-    c.execute("SELECT * FROM players WHERE id = ?", (player_id,))
-    row = c.fetchone()
-    conn.close()
-    return row
-
-
-def set_player_target(santa_id: int, receiver_id: int):
-    conn = get_conn()
-    c = conn.cursor()
-
-    now = datetime.utcnow().isoformat()
-    c.execute(
-        """
-        UPDATE players
-        SET target_id = ?, updated_at = ?
-        WHERE id = ?
-        """,
-        (receiver_id, now, santa_id),
-    )
-    conn.commit()
-    conn.close()
-
-
-def get_all_players() -> List[Dict]:
-    conn = get_conn(dict_rows=True)
-    c = conn.cursor()
-
-    c.execute("SELECT * FROM players")
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-
-def get_all_players_ready() -> List[Dict]:
-    """
-    Игроки, у которых есть и full_name, и wish.
-    """
-    conn = get_conn(dict_rows=True)
-    c = conn.cursor()
-
-    c.execute(
-        """
-        SELECT * FROM players
-        WHERE full_name IS NOT NULL
-          AND wish IS NOT NULL
-        """
-    )
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-
-# --- СОСТОЯНИЕ ИГРЫ ---
-
-
-def get_game_state() -> Dict:
-    conn = get_conn(dict_rows=True)
-    c = conn.cursor()
-
-    c.execute("SELECT * FROM game_state WHERE id = 1")
-    row = c.fetchone()
-    conn.close()
-    return row
-
-
-def set_registration_open(value: bool):
-    conn = get_conn()
-    c = conn.cursor()
-
-    c.execute(
-        "UPDATE game_state SET registration_open = ? WHERE id = 1",
-        (1 if value else 0,),
-    )
-    conn.commit()
-    conn.close()
-
-
-def set_pairs_assigned(value: bool):
-    conn = get_conn()
-    c = conn.cursor()
-
-    c.execute(
-        "UPDATE game_state SET pairs_assigned = ? WHERE id = 1",
-        (1 if value else 0,),
-    )
-    conn.commit()
-    conn.close()
-
-
-# --- ЖЕРЕБЬЁВКА ---
-
-
-def _create_derangement(ids: List[int]) -> Optional[List[Tuple[int, int]]]:
-    """
-    Строим перестановку без совпадений:
-    для каждого i: ids[i] != shuffled[i]
-    Возвращает список пар (santa_id, receiver_id).
-    """
-    if len(ids) < 2:
-        return None
-
-    max_attempts = 100
-    for _ in range(max_attempts):
-        shuffled = ids[:]
-        random.shuffle(shuffled)
-        if all(a != b for a, b in zip(ids, shuffled)):
-            return list(zip(ids, shuffled))
-    return None
-
-
-def assign_pairs() -> Tuple[bool, int]:
-    """
-    Распределяет пары между игроками.
-    Возвращает (успех, количество игроков).
-    """
-    players = get_all_players_ready()
-
-    if len(players) < 2:
-        return False, len(players)
-
-    ids = [p["id"] for p in players]
-    pairs = _create_derangement(ids)
-
-    if not pairs:
-        return False, 0
-
-    for santa_id, receiver_id in pairs:
-        set_player_target(santa_id, receiver_id)
-
-    # закрываем регистрацию и помечаем, что пары распределены
-    set_registration_open(False)
-    set_pairs_assigned(True)
-
-    return True, len(players)
-
-def reset_game():
-    conn = get_conn()
-    c = conn.cursor()
-
-    # удаляем имя, пожелания и target
-    c.execute("""
-        UPDATE players
-        SET full_name = NULL,
-            wish = NULL,
-            target_id = NULL,
-            updated_at = ?
-    """, (datetime.utcnow().isoformat(),))
-
-    # сбрасываем состояние игры
-    c.execute("""
-        UPDATE game_state
-        SET registration_open = 1,
-            pairs_assigned = 0
-        WHERE id = 1
-    """)
-
-    conn.commit()
-    conn.close()
-
-def build_test_pairs():
-    """
-    Тестовая жеребьёвка:
-    - использует тех же готовых игроков, что и настоящая (get_all_players_ready)
-    - строит дерранжмент
-    - НЕ сохраняет результат в БД
-
-    Возвращает (успех: bool, количество игроков: int, список пар (santa_player, receiver_player)).
-    """
-    players = get_all_players_ready()
-
-    if len(players) < 2:
-        return False, len(players), []
-
-    ids = [p["id"] for p in players]
-    pairs_ids = _create_derangement(ids)
-
-    if not pairs_ids:
-        return False, len(players), []
-
-    id_to_player = {p["id"]: p for p in players}
-    pairs = [(id_to_player[santa_id], id_to_player[receiver_id]) for santa_id, receiver_id in pairs_ids]
-
-    return True, len(players), pairs
-
-def hard_reset_game():
-    """
-    Полный сброс игры:
-    - удаляем всех игроков
-    - открываем регистрацию
-    - помечаем, что пары не распределены
-    """
-    conn = get_conn()
-    c = conn.cursor()
-
-    # Удаляем всех игроков
-    c.execute("DELETE FROM players")
-
-    # Сбрасываем состояние игры
-    c.execute(
-        """
-        UPDATE game_state
-        SET registration_open = 1,
-            pairs_assigned = 0
-        WHERE id = 1
-        """
-    )
-
-    conn.commit()
-    conn.close()
+# db.py
+
+import sqlite3
+import random
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Optional
+
+from config import DB_PATH
+
+
+# Два долгоживущих соединения на процесс: без оверхеда connect/close
+# на каждый запрос и с тёплым page cache между запросами.
+# Одно отдаёт кортежи (записи, счётчики), второе — sqlite3.Row (чтения):
+# row_factory выставляется один раз при создании, а не на каждый вызов.
+# Доступ сериализуем локом, т.к. запросы приходят из пула потоков бота.
+_CONN_TUPLE: Optional[sqlite3.Connection] = None
+_CONN_ROWS: Optional[sqlite3.Connection] = None
+_CONN_LOCK = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+    # journal_mode=WAL задаётся один раз в init_db и сохраняется в файле БД.
+    # Остальные прагмы действуют на соединение:
+    # NORMAL в WAL-режиме безопасен и вдвое сокращает fsync,
+    # busy_timeout спасает от "database is locked" при параллельных запросах.
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=30000")
+    # ~20 МБ page cache (отрицательное значение — в КиБ) и mmap на чтение:
+    # вся база целиком живёт в памяти процесса, чтения без syscall'ов
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+
+@contextmanager
+def get_conn(dict_rows: bool = False):
+    """
+    Отдаёт общее соединение под локом: с dict_rows=True — строки sqlite3.Row
+    (C-реализация, доступ и по индексу, и по имени колонки), без — кортежи.
+    Использовать как `with get_conn() as conn: ...` — закрывать не нужно.
+    """
+    global _CONN_TUPLE, _CONN_ROWS
+    with _CONN_LOCK:
+        if dict_rows:
+            if _CONN_ROWS is None:
+                _CONN_ROWS = _connect()
+                _CONN_ROWS.row_factory = sqlite3.Row
+            yield _CONN_ROWS
+        else:
+            if _CONN_TUPLE is None:
+                _CONN_TUPLE = _connect()
+            yield _CONN_TUPLE
+
+
+# Горячие SQL-запросы — модульные константы: кэш подготовленных выражений
+# sqlite3 ключуется по идентичности строки, так каждый запрос парсится один раз.
+# метки времени считает сам SQLite: strftime в C вместо
+# datetime.utcnow().isoformat() на каждый вызов в Python
+_SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+_SQL_UPSERT_PLAYER = f"""
+    INSERT INTO players (tg_id, tg_username, created_at, updated_at)
+    VALUES (?, ?, {_SQL_NOW}, {_SQL_NOW})
+    ON CONFLICT(tg_id) DO UPDATE SET tg_username = excluded.tg_username
+    RETURNING *
+"""
+
+_SQL_UPDATE_FULL_NAME = f"UPDATE players SET full_name = ?, updated_at = {_SQL_NOW} WHERE tg_id = ?"
+_SQL_UPDATE_WISH = f"UPDATE players SET wish = ?, updated_at = {_SQL_NOW} WHERE tg_id = ?"
+
+_SQL_GET_PLAYER_BY_TG = "SELECT * FROM players WHERE tg_id = ?"
+_SQL_GET_PLAYER_BY_ID = "SELECT * FROM players WHERE id = ?"
+
+_SQL_GET_PLAYER_AND_TARGET = """
+    SELECT p.*,
+           t.id AS t_id, t.full_name AS t_full_name, t.wish AS t_wish
+    FROM players p
+    LEFT JOIN players t ON t.id = p.target_id
+    WHERE p.tg_id = ?
+"""
+
+_SQL_SET_TARGET = """
+    UPDATE players
+    SET target_id = ?, target_full_name = ?, target_wish = ?,
+        notified = 0
+    WHERE id = ?
+"""
+
+_SQL_MARK_NOTIFIED = "UPDATE players SET notified = 1 WHERE id = ?"
+
+_SQL_GET_UNNOTIFIED = """
+    SELECT * FROM players
+    WHERE target_id IS NOT NULL
+      AND (notified IS NULL OR notified = 0)
+"""
+
+_SQL_GET_ALL_PLAYERS = "SELECT * FROM players"
+
+_SQL_GET_ALL_READY = """
+    SELECT * FROM players
+    WHERE full_name IS NOT NULL
+      AND wish IS NOT NULL
+"""
+
+# жеребьёвке из всей строки нужны только id и денормализуемые поля —
+# узкая проекция не тащит лишние колонки через формат записей sqlite
+_SQL_GET_READY_FOR_DRAW = """
+    SELECT id, full_name, wish FROM players
+    WHERE full_name IS NOT NULL
+      AND wish IS NOT NULL
+"""
+
+_SQL_GET_GAME_STATE = "SELECT * FROM game_state WHERE id = 1"
+_SQL_SET_GAME_STATE = "UPDATE game_state SET registration_open = ?, pairs_assigned = ? WHERE id = 1"
+
+
+# --- ИНИЦИАЛИЗАЦИЯ БД ---
+
+
+# Вся схема — одним executescript: один C-вызов вместо череды execute.
+# BEGIN IMMEDIATE внутри скрипта: берём write-lock сразу, схема и строка
+# состояния создаются атомарно. Замечания по отдельным стейтментам:
+# - точечный поиск по tg_id покрывает автоиндекс от UNIQUE-ограничения,
+#   дублирующий idx_players_tg_id из старых версий удаляем;
+# - частичный индекс idx_players_ready: выборка «готовых» игроков для
+#   жеребьёвки и /status идёт по индексу, а не полным сканом;
+# - INSERT OR IGNORE заводит единственную строку состояния, если её нет.
+_DDL_INIT = """
+    BEGIN IMMEDIATE;
+
+    CREATE TABLE IF NOT EXISTS players (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tg_id INTEGER UNIQUE NOT NULL,
+        tg_username TEXT,
+        full_name TEXT,
+        wish TEXT,
+        target_id INTEGER,
+        target_full_name TEXT,
+        target_wish TEXT,
+        notified INTEGER DEFAULT 0,
+        created_at TEXT,
+        updated_at TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS game_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        registration_open INTEGER NOT NULL,
+        pairs_assigned INTEGER NOT NULL
+    );
+
+    DROP INDEX IF EXISTS idx_players_tg_id;
+
+    CREATE INDEX IF NOT EXISTS idx_players_target_id ON players(target_id);
+
+    CREATE INDEX IF NOT EXISTS idx_players_ready ON players(id)
+        WHERE full_name IS NOT NULL AND wish IS NOT NULL;
+
+    INSERT OR IGNORE INTO game_state (id, registration_open, pairs_assigned)
+        VALUES (1, 1, 0);
+
+    COMMIT;
+"""
+
+
+def init_db():
+    with get_conn() as conn:
+        # WAL позволяет читателям работать параллельно с писателем;
+        # менять journal_mode внутри транзакции нельзя, поэтому — до скрипта
+        conn.execute("PRAGMA journal_mode=WAL")
+
+        conn.executescript(_DDL_INIT)
+
+        # миграция старых баз: денормализованные данные получателя
+        # и флаг доставки уведомления о жеребьёвке
+        for column, col_type in (
+            ("target_full_name", "TEXT"),
+            ("target_wish", "TEXT"),
+            ("notified", "INTEGER DEFAULT 0"),
+        ):
+            try:
+                conn.execute(f"ALTER TABLE players ADD COLUMN {column} {col_type}")
+            except sqlite3.OperationalError:
+                # колонка уже есть
+                pass
+            else:
+                if column == "notified":
+                    # колонка только что появилась: игроков с назначенной
+                    # парой старый код уведомлял синхронно при жеребьёвке,
+                    # помечаем их доставленными — иначе дорассылка после
+                    # первого рестарта продублирует сообщение всем
+                    conn.execute(
+                        "UPDATE players SET notified = 1 WHERE target_id IS NOT NULL"
+                    )
+        conn.commit()
+
+
+# --- ИГРОКИ ---
+
+
+def get_or_create_player(tg_id: int, tg_username: Optional[str]) -> Dict:
+    with get_conn(dict_rows=True) as conn:
+        # один UPSERT вместо SELECT → INSERT → SELECT:
+        # при конфликте освежаем username, RETURNING отдаёт строку сразу
+        row = conn.execute(_SQL_UPSERT_PLAYER, (tg_id, tg_username)).fetchone()
+        conn.commit()
+
+        return row
+
+
+def update_full_name(tg_id: int, full_name: str):
+    with get_conn() as conn:
+        conn.execute(_SQL_UPDATE_FULL_NAME, (full_name, tg_id))
+        conn.commit()
+
+
+def update_wish(tg_id: int, wish: str):
+    with get_conn() as conn:
+        conn.execute(_SQL_UPDATE_WISH, (wish, tg_id))
+        conn.commit()
+
+
+def get_player_by_tg(tg_id: int) -> Optional[Dict]:
+    with get_conn(dict_rows=True) as conn:
+        return conn.execute(_SQL_GET_PLAYER_BY_TG, (tg_id,)).fetchone()
+
+
+def get_player_by_id(player_id: int) -> Optional[Dict]:
+    with get_conn(dict_rows=True) as conn:
+        return conn.execute(_SQL_GET_PLAYER_BY_ID, (player_id,)).fetchone()
+
+
+def get_player_and_target(tg_id: int) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    Одним JOIN-запросом возвращает (игрок, его получатель).
+    Получатель — None, если пара не назначена.
+    """
+    with get_conn(dict_rows=True) as conn:
+        row = conn.execute(_SQL_GET_PLAYER_AND_TARGET, (tg_id,)).fetchone()
+
+    if row is None:
+        return None, None
+
+    receiver = None
+    if row["t_id"] is not None:
+        receiver = {
+            "id": row["t_id"],
+            "full_name": row["t_full_name"],
+            "wish": row["t_wish"],
+        }
+
+    player = {k: row[k] for k in row.keys() if k not in ("t_id", "t_full_name", "t_wish")}
+    return player, receiver
+
+
+def get_players_by_ids(player_ids: List[int]) -> Dict[int, Dict]:
+    """
+    Одним запросом достаёт игроков по списку id.
+    Возвращает словарь {id: player}.
+    """
+    if not player_ids:
+        return {}
+
+    with get_conn(dict_rows=True) as conn:
+        placeholders = ",".join("?" * len(player_ids))
+        rows = conn.execute(
+            f"SELECT * FROM players WHERE id IN ({placeholders})",
+            player_ids,
+        ).fetchall()
+
+    return {row["id"]: row for row in rows}
+
+
+def set_player_target(santa_id: int, receiver: Dict):
+    """
+    Записывает Санте его получателя. Имя и пожелания получателя
+    денормализуем в строку Санты, чтобы кнопка «Узнать» обходилась
+    одним чтением из БД.
+    """
+    with get_conn() as conn:
+        conn.execute(_SQL_SET_TARGET, (receiver["id"], receiver["full_name"], receiver["wish"], santa_id))
+        conn.commit()
+
+
+def mark_notified(player_id: int):
+    """
+    Помечает, что игрок получил уведомление о жеребьёвке.
+    """
+    with get_conn() as conn:
+        conn.execute(_SQL_MARK_NOTIFIED, (player_id,))
+        conn.commit()
+
+
+def get_unnotified_players() -> List[Dict]:
+    """
+    Игроки с назначенной парой, до которых рассылка ещё не дошла
+    (например, бот перезапустился посреди рассылки).
+    """
+    with get_conn(dict_rows=True) as conn:
+        return conn.execute(_SQL_GET_UNNOTIFIED).fetchall()
+
+
+def get_all_players() -> List[Dict]:
+    with get_conn(dict_rows=True) as conn:
+        return conn.execute(_SQL_GET_ALL_PLAYERS).fetchall()
+
+
+def get_all_players_ready() -> List[Dict]:
+    """
+    Игроки, у которых есть и full_name, и wish.
+    """
+    with get_conn(dict_rows=True) as conn:
+        return conn.execute(_SQL_GET_ALL_READY).fetchall()
+
+
+# --- СОСТОЯНИЕ ИГРЫ ---
+
+# game_state — одна строка, меняется только сеттерами ниже,
+# поэтому читаем её из памяти, а не из БД на каждом апдейте.
+# TTL не нужен: каждый писатель сам обновляет кэш после коммита.
+_GAME_STATE_CACHE: Optional[Dict] = None
+
+
+def get_game_state() -> Dict:
+    global _GAME_STATE_CACHE
+    if _GAME_STATE_CACHE is not None:
+        return _GAME_STATE_CACHE
+
+    with get_conn(dict_rows=True) as conn:
+        row = conn.execute(_SQL_GET_GAME_STATE).fetchone()
+        _GAME_STATE_CACHE = dict(row) if row is not None else None
+        return _GAME_STATE_CACHE
+
+
+def _cache_game_state(registration_open: int, pairs_assigned: int):
+    global _GAME_STATE_CACHE
+    _GAME_STATE_CACHE = {
+        "id": 1,
+        "registration_open": registration_open,
+        "pairs_assigned": pairs_assigned,
+    }
+
+
+def set_game_state(registration_open: bool, pairs_assigned: bool):
+    """
+    Обновляет оба флага состояния одним UPDATE и одним коммитом
+    (вместо прежней пары раздельных сеттеров) и освежает кэш.
+    """
+    reg, pairs = 1 if registration_open else 0, 1 if pairs_assigned else 0
+    with get_conn() as conn:
+        conn.execute(_SQL_SET_GAME_STATE, (reg, pairs))
+        conn.commit()
+        _cache_game_state(reg, pairs)
+
+
+# --- ЖЕРЕБЬЁВКА ---
+
+
+def _create_derangement(ids: List[int]) -> List[Tuple[int, int]]:
+    """
+    Строим перестановку без совпадений алгоритмом Саттоло:
+    один проход вместо retry-перемешиваний, результат — всегда
+    один цикл, поэтому никто не дарит сам себе.
+    Возвращает список пар (santa_id, receiver_id).
+    Ожидает len(ids) >= 2 (проверяется в вызывающих).
+    """
+    shuffled = ids[:]
+    for i in range(len(shuffled) - 1, 0, -1):
+        j = random.randrange(i)
+        shuffled[i], shuffled[j] = shuffled[j], shuffled[i]
+    return list(zip(ids, shuffled))
+
+
+def assign_pairs() -> Tuple[bool, int]:
+    """
+    Распределяет пары между игроками.
+    Возвращает (успех, количество игроков).
+    """
+    # вся жеребьёвка — одна IMMEDIATE-транзакция: выборка игроков,
+    # записи пар и смена состояния атомарны, write-lock берётся один раз,
+    # и между SELECT и UPDATE никто не успеет изменить список игроков
+    with get_conn(dict_rows=True) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+
+        players = conn.execute(_SQL_GET_READY_FOR_DRAW).fetchall()
+
+        if len(players) < 2:
+            conn.rollback()
+            return False, len(players)
+
+        id_to_player = {p["id"]: p for p in players}
+        pairs = _create_derangement(list(id_to_player))
+
+        rows = [
+            (
+                receiver["id"],
+                receiver["full_name"],
+                receiver["wish"],
+                santa_id,
+            )
+            for santa_id, receiver_id in pairs
+            for receiver in (id_to_player[receiver_id],)
+        ]
+
+        conn.executemany(_SQL_SET_TARGET, rows)
+
+        # закрываем регистрацию и помечаем, что пары распределены
+        conn.execute(_SQL_SET_GAME_STATE, (0, 1))
+
+        conn.commit()
+        _cache_game_state(0, 1)
+
+    return True, len(players)
+
+
+def reset_game():
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+
+        # удаляем имя, пожелания и target
+        conn.execute(f"""
+            UPDATE players
+            SET full_name = NULL,
+                wish = NULL,
+                target_id = NULL,
+                target_full_name = NULL,
+                target_wish = NULL,
+                notified = 0,
+                updated_at = {_SQL_NOW}
+        """)
+
+        # сбрасываем состояние игры
+        conn.execute(_SQL_SET_GAME_STATE, (1, 0))
+
+        conn.commit()
+        _cache_game_state(1, 0)
+
+
+def build_test_pairs():
+    """
+    Тестовая жеребьёвка:
+    - использует тех же готовых игроков, что и настоящая (get_all_players_ready)
+    - строит дерранжмент
+    - НЕ сохраняет результат в БД
+
+    Возвращает (успех: bool, количество игроков: int, список пар (santa_player, receiver_player)).
+    """
+    players = get_all_players_ready()
+
+    if len(players) < 2:
+        return False, len(players), []
+
+    id_to_player = {p["id"]: p for p in players}
+    pairs_ids = _create_derangement(list(id_to_player))
+
+    pairs = [(id_to_player[santa_id], id_to_player[receiver_id]) for santa_id, receiver_id in pairs_ids]
+
+    return True, len(players), pairs
+
+
+def hard_reset_game():
+    """
+    Полный сброс игры:
+    - удаляем всех игроков
+    - открываем регистрацию
+    - помечаем, что пары не распределены
+    """
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+
+        # Удаляем всех игроков
+        conn.execute("DELETE FROM players")
+
+        # Сбрасываем состояние игры
+        conn.execute(_SQL_SET_GAME_STATE, (1, 0))
+
+        conn.commit()
+        _cache_game_state(1, 0)
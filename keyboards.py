@@ -1,42 +1,50 @@
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from texts import BUTTONS
-
-
-def get_know_target_keyboard() -> InlineKeyboardMarkup:
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text=BUTTONS["know_target"],
-                    callback_data="know_target"
-                )
-            ]
-        ]
-    )
-    return kb
-
-
-def get_reset_confirm_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="⚠ Подтвердить сброс (мягкий)",
-                    callback_data="admin_reset_game_confirm"
-                )
-            ]
-        ]
-    )
-
-
-def get_hard_reset_confirm_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="🗑 Полный сброс игры",
-                    callback_data="admin_hard_reset_game_confirm"
-                )
-            ]
-        ]
-    )
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from texts import BUTTONS
+
+
+# Клавиатуры неизменяемые, поэтому каждую собираем один раз при импорте:
+# геттеры просто возвращают готовый объект без pydantic-валидации на вызов
+_KNOW_TARGET_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text=BUTTONS["know_target"],
+                callback_data="know_target"
+            )
+        ]
+    ]
+)
+
+_RESET_CONFIRM_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="⚠ Подтвердить сброс (мягкий)",
+                callback_data="admin_reset_game_confirm"
+            )
+        ]
+    ]
+)
+
+_HARD_RESET_CONFIRM_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="🗑 Полный сброс игры",
+                callback_data="admin_hard_reset_game_confirm"
+            )
+        ]
+    ]
+)
+
+
+def get_know_target_keyboard() -> InlineKeyboardMarkup:
+    return _KNOW_TARGET_KB
+
+
+def get_reset_confirm_keyboard() -> InlineKeyboardMarkup:
+    return _RESET_CONFIRM_KB
+
+
+def get_hard_reset_confirm_keyboard() -> InlineKeyboardMarkup:
+    return _HARD_RESET_CONFIRM_KB
@@ -1,129 +1,191 @@
-# texts.py
-
-from config import REVEAL_DATE
-
-PLAYER_MESSAGES = {
-    "start_new": (
-        "Привет! 🎅 Я — твой Тайный Санта от *me hotel*! 🎁✨\n\n"
-        "Если хочешь стать частью волшебства и получить сюрприз, "
-        "напиши мне своё *имя и фамилию*! 💌🎄"
-    ),
-
-    "continue_no_name": (
-        "Давай продолжим! ✨\n\n"
-        "Напиши, пожалуйста, своё *имя и фамилию*, чтобы я знал, "
-        "как тебя представить твоему Тайному Санте 🎅"
-    ),
-
-    "ask_full_name_invalid": (
-        "Напиши, пожалуйста, *имя и фамилию* обычным текстом 🙂"
-    ),
-
-    "ask_wish": (
-        "Волшебно! ✨\n\n"
-        "Теперь напиши, *что хочешь получить*, а *что точно нет*! 🎁🙅‍♂️\n"
-        "_(можно одним сообщением: сначала пожелания, потом то, чего не хочешь)_"
-    ),
-
-    "ask_wish_invalid": (
-        "Напиши, пожалуйста, свои пожелания текстом 🙂\n"
-        "Можешь описать, что тебе приятно получить, а чего лучше избегать 🎁"
-    ),
-
-    "registration_done_info": (
-        "Твои данные сохранены! 🎉\n\n"
-        f"*{REVEAL_DATE}* ты узнаешь, кому будешь дарить подарок! 🎅✨ Будет весело!"
-    ),
-
-    "registration_done_ask_know": (
-        "Пришло время узнать, *кому ты будешь дарить подарок* в этот Новый год! 🎁🎄\n\n"
-        "Готов удивлять и радовать? 🥳✨"
-    ),
-
-    "know_not_finished_registration": (
-        "Сначала давай закончим регистрацию! ✍️\n\n"
-        "Напиши мне своё *имя, фамилию* и пожелания к подарку — "
-        "и я обязательно расскажу, кому ты будешь дарить 🎁"
-    ),
-
-    "know_before_draw": (
-        "Я ещё не провёл жеребьёвку Тайных Сант 🎅\n\n"
-        f"Как только всё будет готово — я пришлю тебе сообщение.\n"
-        f"Загляни сюда *{REVEAL_DATE}* и обязательно нажми *«Узнать»*! ✨"
-    ),
-
-    "know_after_draw": (
-        "Поздравляю! 🎅✨ Ты стал Тайным Сантой для:\n"
-        "*{target_full_name}*\n\n"
-        "Вот что он(а) хочет получить в подарок, а что не хочет 🎁🙌:\n"
-        "{target_wish}"
-    ),
-
-    "know_no_target_error": (
-        "Похоже, ты не попал в жеребьёвку в этот раз 😔\n\n"
-        "Если ты уверен, что регистрировался, напиши своему организатору, "
-        "чтобы он проверил список участников."
-    ),
-
-    "start_after_close_new": (
-        "Регистрация на Тайного Санту уже закрыта 🎄\n\n"
-        "Но ты точно успеешь в следующем году! 🎁"
-    ),
-
-    "already_registered_waiting_draw": (
-        "Ты уже участвуешь в игре Тайный Санта 🎅\n\n"
-        "Сейчас идёт регистрация участников.\n"
-        "Я напишу тебе, когда жеребьёвка будет проведена 🎁"
-    ),
-
-    "already_registered_waiting_draw": (
-        "Ты уже участвуешь в игре Тайный Санта 🎅\n\n"
-        "Сейчас идёт регистрация участников.\n"
-        "Я напишу тебе, когда жеребьёвка будет проведена 🎁"
-    ),
-}
-
-ADMIN_MESSAGES = {
-    "players_header": "*Список игроков:*\n\n",
-
-    "close_reg_not_enough_players": (
-        "Не могу провести жеребьёвку 😅\n\n"
-        "Игроков с заполненными пожеланиями: *{count}*.\n"
-        "Нужно минимум *2* участника."
-    ),
-
-    "close_reg_already_closed": (
-        "Регистрация уже закрыта, а пары Тайных Сант распределены 🎄\n\n"
-        "Игроки могут узнавать, кому дарят подарки, по кнопке *«Узнать»*."
-    ),
-
-    "close_reg_success": (
-        "Жеребьёвка Тайных Сант завершена! 🎄\n\n"
-        "Игроков в розыгрыше: *{players_count}*.\n"
-        "Всем назначены получатели подарков 🎁"
-    ),
-
-    "status_template": (
-        "*Статус игры:*\n"
-        "• Регистрация: *{reg_status}*\n"
-        "• Игроков всего: *{total}*\n"
-        "• Заполнили пожелания: *{with_wish}*\n"
-        "• Пары распределены: *{pairs_status}*"
-    ),
-
-    "no_players": "Игроков пока нет."
-}
-
-BROADCAST_MESSAGES = {
-    "after_draw_notification": (
-        "Волшебство свершилось! ✨\n"
-        "Жеребьёвка Тайных Сант завершена 🎄\n\n"
-        "Теперь ты можешь узнать, кому будешь дарить подарок в этом году 🎁\n"
-        "Просто нажми кнопку *«Узнать»* в этом чате!"
-    )
-}
-
-BUTTONS = {
-    "know_target": "Узнать"
-}
-
+# texts.py
+
+from config import REVEAL_DATE
+
+PLAYER_MESSAGES = {
+    "start_new": (
+        "Привет! 🎅 Я — твой Тайный Санта от *me hotel*! 🎁✨\n\n"
+        "Если хочешь стать частью волшебства и получить сюрприз, "
+        "напиши мне своё *имя и фамилию*! 💌🎄"
+    ),
+
+    "continue_no_name": (
+        "Давай продолжим! ✨\n\n"
+        "Напиши, пожалуйста, своё *имя и фамилию*, чтобы я знал, "
+        "как тебя представить твоему Тайному Санте 🎅"
+    ),
+
+    "ask_full_name_invalid": (
+        "Напиши, пожалуйста, *имя и фамилию* обычным текстом 🙂"
+    ),
+
+    "ask_wish": (
+        "Волшебно! ✨\n\n"
+        "Теперь напиши, *что хочешь получить*, а *что точно нет*! 🎁🙅‍♂️\n"
+        "_(можно одним сообщением: сначала пожелания, потом то, чего не хочешь)_"
+    ),
+
+    "ask_wish_invalid": (
+        "Напиши, пожалуйста, свои пожелания текстом 🙂\n"
+        "Можешь описать, что тебе приятно получить, а чего лучше избегать 🎁"
+    ),
+
+    "registration_done_info": (
+        "Твои данные сохранены! 🎉\n\n"
+        f"*{REVEAL_DATE}* ты узнаешь, кому будешь дарить подарок! 🎅✨ Будет весело!"
+    ),
+
+    "registration_done_ask_know": (
+        "Пришло время узнать, *кому ты будешь дарить подарок* в этот Новый год! 🎁🎄\n\n"
+        "Готов удивлять и радовать? 🥳✨"
+    ),
+
+    "know_not_finished_registration": (
+        "Сначала давай закончим регистрацию! ✍️\n\n"
+        "Напиши мне своё *имя, фамилию* и пожелания к подарку — "
+        "и я обязательно расскажу, кому ты будешь дарить 🎁"
+    ),
+
+    "know_before_draw": (
+        "Я ещё не провёл жеребьёвку Тайных Сант 🎅\n\n"
+        f"Как только всё будет готово — я пришлю тебе сообщение.\n"
+        f"Загляни сюда *{REVEAL_DATE}* и обязательно нажми *«Узнать»*! ✨"
+    ),
+
+    "know_after_draw": (
+        "Поздравляю! 🎅✨ Ты стал Тайным Сантой для:\n"
+        "*{target_full_name}*\n\n"
+        "Вот что он(а) хочет получить в подарок, а что не хочет 🎁🙌:\n"
+        "{target_wish}"
+    ),
+
+    "know_no_target_error": (
+        "Похоже, ты не попал в жеребьёвку в этот раз 😔\n\n"
+        "Если ты уверен, что регистрировался, напиши своему организатору, "
+        "чтобы он проверил список участников."
+    ),
+
+    "start_after_close_new": (
+        "Регистрация на Тайного Санту уже закрыта 🎄\n\n"
+        "Но ты точно успеешь в следующем году! 🎁"
+    ),
+
+    "already_registered_waiting_draw": (
+        "Ты уже участвуешь в игре Тайный Санта 🎅\n\n"
+        "Сейчас идёт регистрация участников.\n"
+        "Я напишу тебе, когда жеребьёвка будет проведена 🎁"
+    ),
+
+    "already_registered_after_draw": (
+        "Жеребьёвка Тайных Сант уже прошла! 🎄\n\n"
+        "Нажми кнопку *«Узнать»*, чтобы посмотреть, "
+        "кому ты даришь подарок в этом году 🎁"
+    ),
+
+    "fallback": (
+        "Я пока понимаю только команды, связанные с игрой Тайный Санта 🎅\n\n"
+        "Нажми /start, чтобы начать или продолжить участие в игре."
+    ),
+}
+
+ADMIN_MESSAGES = {
+    "players_header": "*Список игроков:*\n\n",
+
+    "close_reg_not_enough_players": (
+        "Не могу провести жеребьёвку 😅\n\n"
+        "Игроков с заполненными пожеланиями: *{count}*.\n"
+        "Нужно минимум *2* участника."
+    ),
+
+    "close_reg_already_closed": (
+        "Регистрация уже закрыта, а пары Тайных Сант распределены 🎄\n\n"
+        "Игроки могут узнавать, кому дарят подарки, по кнопке *«Узнать»*."
+    ),
+
+    "close_reg_success": (
+        "Жеребьёвка Тайных Сант завершена! 🎄\n\n"
+        "Игроков в розыгрыше: *{players_count}*.\n"
+        "Всем назначены получатели подарков 🎁"
+    ),
+
+    "status_template": (
+        "*Статус игры:*\n"
+        "• Регистрация: *{reg_status}*\n"
+        "• Игроков всего: *{total}*\n"
+        "• Заполнили пожелания: *{with_wish}*\n"
+        "• Пары распределены: *{pairs_status}*"
+    ),
+
+    "no_players": "Игроков пока нет.",
+
+    "help_admin": (
+        "Команды администратора:\n\n"
+        "/players — список игроков и их статусы\n"
+        "/status — состояние игры\n"
+        "/close_reg — боевая жеребьёвка\n"
+        "/test_draw — тестовая жеребьёвка\n"
+        "/pairs — показать, кто кому дарит (кроме самого админа)\n"
+        "/reset_game — мягкий сброс\n"
+        "/reset_all — полный сброс\n"
+        "/help_admin — показать список команд\n"
+    ),
+
+    "test_draw_already_closed": (
+        "Пары уже распределены.\n\n"
+        "Чтобы запустить тестовую жеребьёвку ещё раз, сначала сделай /reset_game или /reset_all."
+    ),
+
+    "test_draw_success": (
+        "🧪 *Тестовая жеребьёвка завершена!*\n\n"
+        "Игроков в тесте: *{count}*.\n"
+        "Пары сохранены в БД, игроки получили уведомления и могут нажимать «Узнать».\n\n"
+        "Когда закончишь тест, выполни команду /reset_game или /reset_all, чтобы всё сбросить."
+    ),
+
+    "reset_soft_warning": (
+        "⚠ *МЯГКИЙ СБРОС ИГРЫ*\n\n"
+        "Будут удалены *имена, пожелания и все пары*, но список игроков сохранится.\n"
+        "Игроки смогут зарегистрироваться заново.\n\n"
+        "Подтверди действие кнопкой ниже:"
+    ),
+
+    "reset_soft_done": (
+        "♻ Мягкий сброс выполнен!\n\n"
+        "Имена, пожелания и пары очищены.\n"
+        "Регистрация снова открыта. 🎅"
+    ),
+
+    "reset_hard_warning": (
+        "🗑 *ПОЛНЫЙ СБРОС ИГРЫ*\n\n"
+        "Ты собираешься *полностью* удалить всех зарегистрированных игроков "
+        "и начать игру с нуля.\n\n"
+        "Будут удалены *все игроки, их пожелания и пары*.\n"
+        "ЭТО ДЕЙСТВИЕ НЕОБРАТИМО.\n\n"
+        "Если ты уверен, нажми кнопку ниже:"
+    ),
+
+    "reset_hard_done": (
+        "🗑 *Полный сброс выполнен!*\n\n"
+        "Все игроки удалены, регистрация открыта.\n"
+        "Можно начинать абсолютно новую игру 🎅"
+    ),
+
+    "fallback": (
+        "Я не понимаю эту команду.\n"
+        "Используй /help_admin, чтобы посмотреть доступные команды администратора."
+    ),
+}
+
+BROADCAST_MESSAGES = {
+    "after_draw_notification": (
+        "Волшебство свершилось! ✨\n"
+        "Жеребьёвка Тайных Сант завершена 🎄\n\n"
+        "Теперь ты можешь узнать, кому будешь дарить подарок в этом году 🎁\n"
+        "Просто нажми кнопку *«Узнать»* в этом чате!"
+    )
+}
+
+BUTTONS = {
+    "know_target": "Узнать"
+}
+